@@ -1,49 +1,138 @@
 import os
-from typing import List
+from array import array
+from itertools import accumulate, repeat
+from operator import add, mod, mul, sub
+from typing import Iterator, Optional, Sequence
 
+INPUT_LOCATION = os.path.join(os.path.dirname(__file__), 'input.txt')
 
-def parse_input() -> List[str]:
-    """ Reads the input file and returns a list of strings. """
-    file_location = os.path.join(os.path.dirname(__file__), 'input.txt')
-    input_values = []
+
+def parse_input() -> array:
+    """ Reads the input file and returns an int64 array of the deltas. """
+    with open(INPUT_LOCATION, 'r') as data:
+        return array('q', map(int, data.read().split()))
+
+
+def iter_delta_chunks(file_location: str = INPUT_LOCATION, chunk_size: int = 1 << 20) -> Iterator[array]:
+    """
+    Reads the given file in blocks of roughly `chunk_size` characters,
+    yielding an int64 array of the deltas in each block.
+
+    Only one block is held in memory at a time.
+    """
+    remainder = ''
     with open(file_location, 'r') as data:
-        for line in data:
-            input_values.append(line.strip())
-    return input_values
+        while True:
+            block = data.read(chunk_size)
+            if not block:
+                break
+            tokens = (remainder + block).split()
+            # The last token may continue into the next block.
+            remainder = '' if block[-1].isspace() else tokens.pop() if tokens else ''
+            yield array('q', map(int, tokens))
+    if remainder:
+        yield array('q', [int(remainder)])
+
 
+def running_totals(deltas: Sequence[int]) -> array:
+    """ Returns the frequency after each delta, as one cumulative sum. """
+    return array('q', accumulate(deltas))
 
-def input_gen(input_data: List[str]):
-    """ A generator that will continuously iterate over the given list. """
-    while True:
-        for item in input_data:
-            yield item
+
+def iter_running_totals_chunked(file_location: str = INPUT_LOCATION, chunk_size: int = 1 << 20) -> Iterator[array]:
+    """
+    A memory bounded `running_totals`, for files larger than memory.
+
+    Yields the running totals block by block, carrying the total across blocks.
+    """
+    total = 0
+    for chunk in iter_delta_chunks(file_location, chunk_size):
+        if chunk:
+            chunk[0] += total
+            totals = running_totals(chunk)
+            total = totals[-1]
+            yield totals
+
+
+def first_repeated_frequency(deltas: Sequence[int]) -> Optional[int]:
+    """
+    Returns the first frequency reached twice when the deltas are applied
+    over and over, without simulating any of the repeated cycles.
+
+    Every frequency in cycle k is a first cycle prefix sum plus k * drift,
+    so a later cycle can only land on a first cycle value that shares its
+    residue modulo the drift. Sorting the prefix sums by (residue, distance
+    along the drift, index) puts each value next to the one it reaches
+    first, and equal values next to each other, so one scan over the
+    neighbours finds the repeat minimising (cycles * n) + index.
+
+    Each prefix sum is packed into a single sort key int, so memory stays
+    at a few dozen bytes per delta.
+
+    Returns None if no frequency is ever reached twice.
+    """
+    size = len(deltas)
+    if not size:
+        return None
+
+    totals = running_totals(deltas)
+    drift = totals[-1]
+    # The frequencies reached during the first cycle, starting from 0.
+    prefix_sums = array('q', [0]) + totals[:-1]
+    del totals
+
+    # Measure values along the direction of the drift, grouped by residue.
+    # With no drift, every value is in the same group.
+    sign = -1 if drift < 0 else 1
+    step = abs(drift)
+    smallest, largest = min(prefix_sums), max(prefix_sums)
+    lowest = smallest if sign > 0 else -largest
+    width = largest - smallest + 1
+
+    along = map(mul, prefix_sums, repeat(sign))
+    residues = map(mod, map(mul, prefix_sums, repeat(sign)), repeat(step)) if step else repeat(0)
+    positions = map(add, map(mul, residues, repeat(width)), map(sub, along, repeat(lowest)))
+    keys = sorted(map(add, map(mul, positions, repeat(size)), range(size)))
+
+    # With no drift, the first cycle ends back on the starting frequency.
+    best_time, best_value = (size, 0) if not step else (None, None)
+    previous = None
+    for key in keys:
+        position, index = divmod(key, size)
+        if previous is not None and previous[0] // width == position // width:
+            previous_position, previous_index = previous
+            time = None
+            if position == previous_position:
+                # A repeat within the first cycle, at the later index. Any
+                # repeat in a later cycle happens after it.
+                time = index
+            elif step:
+                # `previous` reaches this value after this many full cycles.
+                cycles = (position - previous_position) // step
+                time = cycles * size + previous_index
+            if time is not None and (best_time is None or time < best_time):
+                best_time, best_value = time, prefix_sums[index]
+        previous = position, index
+
+    return best_value
 
 
 # ============================ Part One ===============================
 
 
-def part_one(input_data: List[str]):
+def part_one(input_data: Sequence[int]):
     """ Puzzle Answer == 400 """
-    total = 0
-    for item in input_data:
-        total += int(item)
-    print(total)
+    totals = running_totals(input_data)
+    print(totals[-1] if totals else 0)
 
 
 # ============================ Part Two ===============================
 
 
-def part_two(input_data: List[str]):
+def part_two(input_data: Sequence[int]):
     """ Puzzle Answer == 232 """
-    total = 0
-    already_seen = [0]
-    for item in input_gen(input_data):
-        total += int(item)
-        if total not in already_seen:
-            already_seen.append(total)
-        else:
-            break
-    print(total)
+    frequency = first_repeated_frequency(input_data)
+    print(frequency if frequency is not None else 'Never repeats')
 
 
 # =====================================================================
@@ -1,66 +1,188 @@
 import os
-from typing import List, Optional, Tuple
+import sys
+from collections import defaultdict
+from itertools import repeat
+from operator import eq
+from typing import Dict, Iterable, List, Tuple
+
+
+INPUT_LOCATION = os.path.join(os.path.dirname(__file__), 'input.txt')
 
 
 def parse_input() -> List[str]:
     """ Reads the input file and returns a list of strings. """
-    file_location = os.path.join(os.path.dirname(__file__), 'input.txt')
     input_values = []
-    with open(file_location, 'r') as data:
+    with open(INPUT_LOCATION, 'r') as data:
         for line in data:
             input_values.append(line.strip())
     return input_values
 
 
-def is_2_or_3(input_string: str) -> Tuple[bool, bool]:
+# Lookup tables marking which per row letter counts are exactly 2 or 3.
+EXACTLY_TWO = bytes(count == 2 for count in range(256))
+EXACTLY_THREE = bytes(count == 3 for count in range(256))
+
+# Memoryview formats for reading back row counts, by lane width in bytes.
+LANE_FORMATS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+
+def pack_lines(buffer: bytes) -> Tuple[bytes, int]:
     """
-    Returns a tuple of booleans indicating whether a string contains any
-    character exactly 2 or 3 times.
+    Packs newline separated IDs into one contiguous buffer of fixed width
+    rows, and returns it with the row width.
+
+    When every line is the same width, which the stride of the newlines
+    shows without splitting, the newlines are simply deleted. Ragged lines
+    are padded out to the widest with zero bytes.
     """
-    alpha = 'abcdefghijklmnopqrstuvwxyz'
-    seen_dict = {char: 0 for char in alpha}
+    buffer = buffer.translate(None, b'\r').strip()
+    if not buffer:
+        return b'', 0
 
-    for letter in input_string:
-        seen_dict[letter] += 1
+    rows = buffer.count(b'\n') + 1
+    width = buffer.find(b'\n') if rows > 1 else len(buffer)
+    if len(buffer) == rows * (width + 1) - 1 and buffer[width::width + 1].count(b'\n') == rows - 1:
+        return buffer.translate(None, b'\n'), width
 
-    counts = set(seen_dict.values())
-    return 2 in counts, 3 in counts
+    lines = buffer.split(b'\n')
+    width = max(map(len, lines))
+    return b''.join(line.ljust(width, b'\0') for line in lines), width
 
 
-def find_common_ids(id_string: str, id_list: List[str]) -> Optional[str]:
+def count_twos_and_threes(packed: bytes, width: int) -> Tuple[int, int]:
+    """
+    Returns how many of the fixed width rows in the packed buffer contain
+    any character exactly 2 times, and how many exactly 3 times.
+
+    Every row is histogrammed at once, one letter at a time: the buffer is
+    translated to a 0/1 mask of that letter, and the strided column slices
+    of the mask are summed as big integers with one lane per row. Lanes are
+    a byte wide unless a row is long enough for a count to reach 256, in
+    which case they are widened so no lane ever carries into the next row.
     """
-    Iterates through the given list, to find a match to the given string,
-    where the two strings are identical except for a single character at
-    the same index.
+    rows = len(packed) // width if width else 0
+    if not rows:
+        return 0, 0
+
+    lane = next(size for size in LANE_FORMATS if width < 256 ** size)
+    lanes = bytearray(rows * lane) if lane > 1 else None
+
+    has_two = 0
+    has_three = 0
+    for letter in range(1, 256):
+        if bytes((letter,)) not in packed:
+            continue
+        letter_mask = bytearray(256)
+        letter_mask[letter] = 1
+        mask = packed.translate(letter_mask)
+
+        total = 0
+        for column in range(width):
+            if lanes is None:
+                total += int.from_bytes(mask[column::width], sys.byteorder)
+            else:
+                lanes[::lane] = mask[column::width]
+                total += int.from_bytes(lanes, sys.byteorder)
+        row_counts = total.to_bytes(rows * lane, sys.byteorder)
+
+        if lanes is None:
+            twos = row_counts.translate(EXACTLY_TWO)
+            threes = row_counts.translate(EXACTLY_THREE)
+        else:
+            counts = memoryview(row_counts).cast(LANE_FORMATS[lane])
+            twos = bytes(map(eq, counts, repeat(2)))
+            threes = bytes(map(eq, counts, repeat(3)))
+        has_two |= int.from_bytes(twos, 'little')
+        has_three |= int.from_bytes(threes, 'little')
+
+    # Each row contributes a single 0 or 1 bit.
+    return bin(has_two).count('1'), bin(has_three).count('1')
 
-    Returns None if there is no matching string in the given list.
+
+def is_2_or_3(input_string: str) -> Tuple[bool, bool]:
     """
-    match = None
-    for item in id_list:
-        diffs = 0
-        for index, char in enumerate(item):
-            if char != id_string[index]:
-                diffs += 1
-        if diffs == 1:
-            match = item
-            break
-    return match
+    Returns a tuple of booleans indicating whether a string contains any
+    character exactly 2 or 3 times.
+    """
+    packed = input_string.encode('utf-8')
+    twos, threes = count_twos_and_threes(packed, len(packed))
+    return bool(twos), bool(threes)
 
 
-# ============================ Part One ===============================
+def checksum_counts(id_list: Iterable[str]) -> Tuple[int, int]:
+    """ Packs the IDs into one contiguous buffer, and counts twos and threes. """
+    return count_twos_and_threes(*pack_lines('\n'.join(id_list).encode('ascii')))
 
 
-def part_one(input_data: List[str]):
-    """ Puzzle Answer == 8296 """
+def checksum_counts_streaming(file_location: str = INPUT_LOCATION, block_size: int = 1 << 20) -> Tuple[int, int]:
+    """
+    Counts twos and threes for the IDs in the given file, reading it in
+    fixed size blocks so memory stays flat however large the file is.
+    """
     twos = 0
     threes = 0
+    remainder = b''
+    with open(file_location, 'rb') as data:
+        while True:
+            block = data.read(block_size)
+            if not block:
+                break
+            block = remainder + block
+            # The last ID may continue into the next block.
+            end = block.rfind(b'\n')
+            remainder = block[end + 1:]
+            block_twos, block_threes = count_twos_and_threes(*pack_lines(block[:max(end, 0)]))
+            twos += block_twos
+            threes += block_threes
+
+    block_twos, block_threes = count_twos_and_threes(*pack_lines(remainder))
+    return twos + block_twos, threes + block_threes
+
+
+class NearDuplicateIndex:
+    """
+    Indexes box IDs by each of their single position wildcard variants,
+    so any two IDs that differ by exactly one character share a key.
+    """
+
+    buckets: Dict[Tuple[int, str], List[str]]
+
+    def __init__(self, id_list: Iterable[str] = ()):
+        self.buckets = defaultdict(list)
+        for box_id in id_list:
+            self.add(box_id)
 
-    for string_val in input_data:
-        is_two, is_three = is_2_or_3(string_val)
+    def add(self, box_id: str):
+        """ Adds the box ID under each of its wildcard variants. """
+        for index in range(len(box_id)):
+            self.buckets[(index, box_id[:index] + box_id[index + 1:])].append(box_id)
 
-        twos += 1 if is_two else 0
-        threes += 1 if is_three else 0
+    def near_duplicates(self) -> List[Tuple[str, str]]:
+        """
+        Returns every pair of indexed IDs that are identical except for a
+        single character at the same index.
+        """
+        pairs = []
+        for bucket in self.buckets.values():
+            for index, box_id in enumerate(bucket):
+                for other_id in bucket[index + 1:]:
+                    # Identical IDs share every bucket, but differ nowhere.
+                    if box_id != other_id:
+                        pairs.append((box_id, other_id))
+        return pairs
 
+
+def common_letters(id_a: str, id_b: str) -> str:
+    """ Returns the characters the two IDs have in common at the same index. """
+    return ''.join(char_a for char_a, char_b in zip(id_a, id_b) if char_a == char_b)
+
+
+# ============================ Part One ===============================
+
+
+def part_one(input_data: List[str]):
+    """ Puzzle Answer == 8296 """
+    twos, threes = checksum_counts(input_data)
     check_sum = twos * threes
     print(check_sum)
 
@@ -70,10 +192,8 @@ def part_one(input_data: List[str]):
 
 def part_two(input_data: List[str]):
     """ Puzzle Answer == pazvmqbftrbeosiecxlghkwud """
-    for index, item in enumerate(input_data):
-        match = find_common_ids(item, input_data[index+1:])
-        if match:
-            print(''.join([i for n, i in enumerate(list(item)) if list(match)[n] == i]))
+    for id_a, id_b in NearDuplicateIndex(input_data).near_duplicates():
+        print(common_letters(id_a, id_b))
 
 
 # =====================================================================
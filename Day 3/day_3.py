@@ -1,12 +1,26 @@
 import os
 import re
-from typing import List
+from array import array
+from collections.abc import Sequence as SequenceABC
+from itertools import accumulate
+from operator import add
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Fabric areas above this many square inches fall back to the sparse dict backend.
+DENSE_AREA_LIMIT = 1 << 22
+
+# The dense grid is only used when the fabric is at most this many times the
+# total claimed area, as the dict backend costs roughly as much per claimed
+# square as the grid does per square of the whole fabric.
+DENSE_COVERAGE_RATIO = 8
 
 
 class FabricClaim:
     """ An elf's claim on santa's special fabric. """
 
-    string_regex = (
+    __slots__ = ('claim_id', 'from_left', 'from_top', 'width', 'height')
+
+    string_regex = re.compile(
         r'^#(?P<claim_id>[0-9]+) @ '
         r'(?P<from_left>[0-9]+),'
         r'(?P<from_top>[0-9]+): '
@@ -23,9 +37,9 @@ class FabricClaim:
 
     @classmethod
     def from_string(cls, data: str) -> 'FabricClaim':
-        match = re.match(cls.string_regex, data)
+        match = cls.string_regex.match(data)
         if not match:
-            raise ValueError(f'Value does not match regex `{cls.string_regex}`')
+            raise ValueError(f'Value does not match regex `{cls.string_regex.pattern}`')
 
         # Convert values to integers.
         group_dict = {key: int(val) for key, val in match.groupdict().items()}
@@ -33,79 +47,428 @@ class FabricClaim:
         return cls(**group_dict)
 
 
+class ClaimColumns(SequenceABC):
+    """
+    A compact columnar store of claims, as five parallel int32 arrays.
+
+    Indexing or iterating produces lightweight FabricClaim views on demand.
+    """
+
+    # Matches every claim in a whole file buffer, one claim per line.
+    claims_regex = re.compile(
+        r'^#([0-9]+) @ ([0-9]+),([0-9]+): ([0-9]+)x([0-9]+)[ \t\r]*$',
+        re.MULTILINE,
+    )
+
+    # Anything between two claims must be blank.
+    blank_regex = re.compile(r'\s*')
+
+    def __init__(self, claim_ids: array, from_lefts: array, from_tops: array, widths: array, heights: array):
+        self.claim_ids = claim_ids
+        self.from_lefts = from_lefts
+        self.from_tops = from_tops
+        self.widths = widths
+        self.heights = heights
+
+    @classmethod
+    def from_buffer(cls, data: str) -> 'ClaimColumns':
+        """
+        Parses every claim in the buffer in a single regex pass, appending
+        each match straight onto the five columns.
+        """
+        columns = cls(array('i'), array('i'), array('i'), array('i'), array('i'))
+        claim_ids, from_lefts, from_tops, widths, heights = (column.append for column in columns.columns)
+
+        position = 0
+        for match in cls.claims_regex.finditer(data):
+            # The matches must cover every line that is not blank.
+            if not cls.blank_regex.fullmatch(data, position, match.start()):
+                raise ValueError(f'Not every line matches regex `{cls.claims_regex.pattern}`')
+            position = match.end()
+
+            claim_id, from_left, from_top, width, height = match.groups()
+            claim_ids(int(claim_id))
+            from_lefts(int(from_left))
+            from_tops(int(from_top))
+            widths(int(width))
+            heights(int(height))
+
+        if not cls.blank_regex.fullmatch(data, position):
+            raise ValueError(f'Not every line matches regex `{cls.claims_regex.pattern}`')
+        return columns
+
+    @property
+    def columns(self) -> Tuple[array, array, array, array, array]:
+        return self.claim_ids, self.from_lefts, self.from_tops, self.widths, self.heights
+
+    def __len__(self) -> int:
+        return len(self.claim_ids)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[FabricClaim, 'ClaimColumns']:
+        if isinstance(index, slice):
+            return ClaimColumns(*(column[index] for column in self.columns))
+        return FabricClaim(
+            self.claim_ids[index],
+            self.from_lefts[index],
+            self.from_tops[index],
+            self.widths[index],
+            self.heights[index],
+        )
+
+    def __iter__(self) -> Iterator[FabricClaim]:
+        return map(FabricClaim, *self.columns)
+
+
 class SpecialFabric:
-    """ Represents the special piece of fabric. """
+    """
+    Represents the special piece of fabric, as a sparse dictionary of squares.
+
+    Claims can be added and removed at any time. The overlap total, and the
+    set of claims that overlap nothing, are kept up to date as they change.
+    """
 
     def __init__(self):
         self.fabric_dict = {}
+        self.claims = {}
+        self.overlapping_squares = {}
+        self.clean_claim_ids = set()
+        self.overlap_total = 0
 
-    def apply_claim(self, claim: FabricClaim):
-        """
-        Calculates the unique id for each square the fabric occupies,
-        and adds the claim to a dictionary.
-        """
+    @staticmethod
+    def claim_squares(claim: FabricClaim) -> Iterable[Tuple[int, int]]:
+        """ Yields the co-ordinates of each square the claim covers. """
         for i in range(claim.width):
             for n in range(claim.height):
-                square_id = f'{i + claim.from_left}x{n + claim.from_top}'
-                if square_id in self.fabric_dict:
-                    self.fabric_dict[square_id].append(claim)
-                else:
-                    self.fabric_dict[square_id] = [claim]
+                yield i + claim.from_left, n + claim.from_top
+
+    def add_claim(self, claim: FabricClaim):
+        """ Adds the claim to each square it occupies, in O(claim area). """
+        if claim.claim_id in self.claims:
+            raise ValueError(f'Claim #{claim.claim_id} has already been added')
+
+        overlapping = 0
+        for square in self.claim_squares(claim):
+            claim_list = self.fabric_dict.setdefault(square, [])
+            if len(claim_list) == 1:
+                # The square's previous sole claim now overlaps this one.
+                other_id = claim_list[0].claim_id
+                self.overlapping_squares[other_id] += 1
+                self.clean_claim_ids.discard(other_id)
+                self.overlap_total += 1
+            if claim_list:
+                overlapping += 1
+            claim_list.append(claim)
+
+        self.claims[claim.claim_id] = claim
+        self.overlapping_squares[claim.claim_id] = overlapping
+        if not overlapping:
+            self.clean_claim_ids.add(claim.claim_id)
+
+    # Shares the `apply_claim` interface with DenseFabric for `build_fabric`.
+    apply_claim = add_claim
+
+    def remove_claim(self, claim_id: int):
+        """ Removes the claim from each square it occupies, in O(claim area). """
+        claim = self.claims.pop(claim_id)
+        for square in self.claim_squares(claim):
+            claim_list = self.fabric_dict[square]
+            claim_list.remove(claim)
+            if len(claim_list) == 1:
+                # The square's remaining claim no longer overlaps here.
+                other_id = claim_list[0].claim_id
+                self.overlapping_squares[other_id] -= 1
+                if not self.overlapping_squares[other_id]:
+                    self.clean_claim_ids.add(other_id)
+                self.overlap_total -= 1
+            elif not claim_list:
+                del self.fabric_dict[square]
+
+        del self.overlapping_squares[claim_id]
+        self.clean_claim_ids.discard(claim_id)
 
     def count_overlaps(self) -> int:
         """
         Returns the number of squares in the fabric dictionary,
         that have more then one claim associated with them.
         """
-        total = 0
-        for claim_list in self.fabric_dict.values():
-            if len(claim_list) >= 2:
-                total += 1
-        return total
-
-    def find_clean_claim(self) -> int:
-        """" Finds the id of the one claim that does not intersect with any others. """
-        dirty_claim_ids = []
-        clean_claim_ids = []
-        for claim_list in self.fabric_dict.values():
-            if len(claim_list) >= 2:
-                dirty_claim_ids.extend([claim.claim_id for claim in claim_list])
-            else:
-                clean_claim_ids.extend([claim.claim_id for claim in claim_list])
-        diff = set(dirty_claim_ids).symmetric_difference(set(clean_claim_ids))
-        return diff.intersection(clean_claim_ids).pop()
-
-
-def parse_input() -> List[FabricClaim]:
-    """ Reads the input file and returns a list of FabricClaims. """
+        return self.overlap_total
+
+    def find_clean_claim(self) -> Optional[int]:
+        """" Finds the id of a claim that does not intersect with any others. """
+        return next(iter(self.clean_claim_ids), None)
+
+
+class DenseFabric:
+    """
+    Represents the special piece of fabric as a dense grid of claim counts.
+
+    Claims are recorded as four corner updates in a 2D difference array,
+    which is resolved into the coverage grid with two cumulative sums.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.claims = []
+        self._difference = array('i', [0]) * ((width + 1) * (height + 1))
+        self._grid = None
+
+    @property
+    def grid(self) -> List[array]:
+        """ The rows of the uint16 coverage grid, resolved on first access. """
+        if self._grid is None:
+            self._grid = self.resolve_grid()
+        return self._grid
+
+    def apply_claim(self, claim: FabricClaim):
+        """ Adds the claim's four corners to the difference array. """
+        stride = self.width + 1
+        top = claim.from_top * stride
+        bottom = (claim.from_top + claim.height) * stride
+        left = claim.from_left
+        right = claim.from_left + claim.width
+
+        self._difference[top + left] += 1
+        self._difference[top + right] -= 1
+        self._difference[bottom + left] -= 1
+        self._difference[bottom + right] += 1
+        self.claims.append(claim)
+        self._grid = None
+
+    def resolve_grid(self) -> List[array]:
+        """ Sums the difference array along each row, then down each column. """
+        stride = self.width + 1
+        rows = []
+        previous_row = array('H', bytes(2 * self.width))
+        for y in range(self.height):
+            row_difference = self._difference[y * stride:y * stride + self.width]
+            previous_row = array('H', map(add, previous_row, accumulate(row_difference)))
+            rows.append(previous_row)
+        return rows
+
+    def count_overlaps(self) -> int:
+        """ Returns the number of squares that have more then one claim on them. """
+        return sum(len(row) - row.count(0) - row.count(1) for row in self.grid)
+
+    def find_clean_claim(self) -> Optional[int]:
+        """ Finds the id of the first claim that does not intersect with any others. """
+        grid = self.grid
+        for claim in self.claims:
+            left = claim.from_left
+            right = claim.from_left + claim.width
+            rows = grid[claim.from_top:claim.from_top + claim.height]
+            if all(max(row[left:right], default=1) == 1 for row in rows):
+                return claim.claim_id
+        return None
+
+
+class ClaimSweepTree:
+    """
+    A segment tree over the compressed y co-ordinates of the claims that
+    are currently crossed by a vertical sweep line.
+
+    Tracks how many claims cover each y segment, the length covered by at
+    least one and at least two claims, and the latest claim inserted over
+    each y segment. Counts are kept as permanent node marks, so no update
+    ever needs to be pushed down the tree.
+    """
+
+    def __init__(self, y_values: List[int]):
+        self.y_values = y_values
+        self.segments = max(len(y_values) - 1, 1)
+        size = 4 * self.segments
+        self.cover = [0] * size
+        self.peak = [0] * size
+        self.covered_once = [0] * size
+        self.covered_twice = [0] * size
+        self.latest = [-1] * size
+        self.latest_below = [-1] * size
+
+    @property
+    def overlap_length(self) -> int:
+        """ The length of the sweep line covered by two or more claims. """
+        return self.covered_twice[1]
+
+    def add(self, low: int, high: int, amount: int, node: int = 1, lo: int = 0, hi: Optional[int] = None):
+        """ Adds `amount` to the claim count of the y segments [low, high). """
+        hi = self.segments if hi is None else hi
+        if high <= lo or hi <= low:
+            return
+        if low <= lo and hi <= high:
+            self.cover[node] += amount
+        else:
+            mid = (lo + hi) // 2
+            self.add(low, high, amount, 2 * node, lo, mid)
+            self.add(low, high, amount, 2 * node + 1, mid, hi)
+        self._pull(node, lo, hi)
+
+    def _pull(self, node: int, lo: int, hi: int):
+        """ Recalculates the node's summaries from its own count and its children. """
+        if hi - lo == 1:
+            child_once = child_twice = child_peak = 0
+        else:
+            left, right = 2 * node, 2 * node + 1
+            child_once = self.covered_once[left] + self.covered_once[right]
+            child_twice = self.covered_twice[left] + self.covered_twice[right]
+            child_peak = max(self.peak[left], self.peak[right])
+
+        full_length = self.y_values[hi] - self.y_values[lo]
+        count = self.cover[node]
+        if count >= 2:
+            self.covered_once[node] = self.covered_twice[node] = full_length
+        elif count == 1:
+            self.covered_once[node] = full_length
+            self.covered_twice[node] = child_once
+        else:
+            self.covered_once[node] = child_once
+            self.covered_twice[node] = child_twice
+        self.peak[node] = count + child_peak
+
+    def max_count(self, low: int, high: int, node: int = 1, lo: int = 0, hi: Optional[int] = None) -> int:
+        """ Returns the highest claim count over the y segments [low, high). """
+        hi = self.segments if hi is None else hi
+        if high <= lo or hi <= low:
+            return 0
+        if low <= lo and hi <= high:
+            return self.peak[node]
+        mid = (lo + hi) // 2
+        return self.cover[node] + max(
+            self.max_count(low, high, 2 * node, lo, mid),
+            self.max_count(low, high, 2 * node + 1, mid, hi),
+        )
+
+    def mark_latest(self, low: int, high: int, order: int, node: int = 1, lo: int = 0, hi: Optional[int] = None):
+        """ Records that the claim inserted `order`th covers the y segments [low, high). """
+        hi = self.segments if hi is None else hi
+        if high <= lo or hi <= low:
+            return
+        if low <= lo and hi <= high:
+            self.latest[node] = max(self.latest[node], order)
+        else:
+            mid = (lo + hi) // 2
+            self.mark_latest(low, high, order, 2 * node, lo, mid)
+            self.mark_latest(low, high, order, 2 * node + 1, mid, hi)
+        self.latest_below[node] = max(self.latest_below[node], order)
+
+    def latest_order(self, low: int, high: int, node: int = 1, lo: int = 0, hi: Optional[int] = None) -> int:
+        """ Returns the latest insertion order marked over the y segments [low, high). """
+        hi = self.segments if hi is None else hi
+        if high <= lo or hi <= low:
+            return -1
+        if low <= lo and hi <= high:
+            return self.latest_below[node]
+        mid = (lo + hi) // 2
+        return max(
+            self.latest[node],
+            self.latest_order(low, high, 2 * node, lo, mid),
+            self.latest_order(low, high, 2 * node + 1, mid, hi),
+        )
+
+
+def sweep_claims(claims: Sequence[FabricClaim]) -> Tuple[List[int], int]:
+    """
+    Sweeps a vertical line across the claims, without rasterizing them.
+
+    A claim is dirty if another claim crosses the sweep line over its y
+    range when it is inserted, or if a later claim is inserted over its y
+    range before it is removed. The cost depends only on the number of claims.
+
+    Returns the ids of every clean claim, and the total overlapping area.
+    """
+    solid_claims = [claim for claim in claims if claim.width > 0 and claim.height > 0]
+    y_values = sorted({claim.from_top for claim in solid_claims} |
+                      {claim.from_top + claim.height for claim in solid_claims})
+    y_index = {y: index for index, y in enumerate(y_values)}
+    tree = ClaimSweepTree(y_values)
+
+    # Removals sort before insertions at the same x, as claims are half open.
+    events = []
+    for claim in solid_claims:
+        events.append((claim.from_left, 1, claim))
+        events.append((claim.from_left + claim.width, 0, claim))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    dirty_claim_ids = set()
+    insertion_order = {}
+    overlap_area = 0
+    previous_x = events[0][0] if events else 0
+    for x, is_insertion, claim in events:
+        overlap_area += tree.overlap_length * (x - previous_x)
+        previous_x = x
+
+        low = y_index[claim.from_top]
+        high = y_index[claim.from_top + claim.height]
+        if is_insertion:
+            if tree.max_count(low, high) > 0:
+                dirty_claim_ids.add(claim.claim_id)
+            insertion_order[claim.claim_id] = order = len(insertion_order)
+            tree.mark_latest(low, high, order)
+            tree.add(low, high, 1)
+        else:
+            if tree.latest_order(low, high) > insertion_order[claim.claim_id]:
+                dirty_claim_ids.add(claim.claim_id)
+            tree.add(low, high, -1)
+
+    clean_claim_ids = [claim.claim_id for claim in claims if claim.claim_id not in dirty_claim_ids]
+    return clean_claim_ids, overlap_area
+
+
+def fabric_size(claims: Iterable[FabricClaim]) -> Tuple[int, int]:
+    """ Returns the width and height of fabric needed to cover every claim. """
+    width = 0
+    height = 0
+    for claim in claims:
+        width = max(width, claim.from_left + claim.width)
+        height = max(height, claim.from_top + claim.height)
+    return width, height
+
+
+def claimed_area(claims: Iterable[FabricClaim]) -> int:
+    """ Returns the total area of every claim, counting overlapping squares once per claim. """
+    return sum(claim.width * claim.height for claim in claims)
+
+
+def build_fabric(claims: Sequence[FabricClaim]) -> Union[DenseFabric, SpecialFabric]:
+    """
+    Applies every claim to a fabric sized to fit them.
+
+    Uses the dense grid, unless the fabric would be too large for it or the
+    claims only cover a small part of it.
+    """
+    width, height = fabric_size(claims)
+    area = width * height
+    if area <= DENSE_AREA_LIMIT and area <= DENSE_COVERAGE_RATIO * claimed_area(claims):
+        fabric = DenseFabric(width, height)
+    else:
+        fabric = SpecialFabric()
+    for claim in claims:
+        fabric.apply_claim(claim)
+    return fabric
+
+
+def parse_input() -> ClaimColumns:
+    """ Reads the input file and returns its FabricClaims in columnar form. """
     file_location = os.path.join(os.path.dirname(__file__), 'input.txt')
-    input_values = []
     with open(file_location, 'r') as data:
-        for line in data:
-            input_values.append(FabricClaim.from_string(line.strip()))
-    return input_values
+        return ClaimColumns.from_buffer(data.read())
 
 
 # ============================ Part One ===============================
 
 
-def part_one(input_data: List[FabricClaim]):
+def part_one(input_data: Sequence[FabricClaim]):
     """ Puzzle Answer == 103806 """
-    fabric = SpecialFabric()
-    for claim in input_data:
-        fabric.apply_claim(claim)
+    fabric = build_fabric(input_data)
     print(fabric.count_overlaps())
 
 
 # ============================ Part Two ===============================
 
 
-def part_two(input_data: List[FabricClaim]):
+def part_two(input_data: Sequence[FabricClaim]):
     """ Puzzle Answer == 625 """
-    fabric = SpecialFabric()
-    for claim in input_data:
-        fabric.apply_claim(claim)
-    print(fabric.find_clean_claim())
+    clean_claim_ids, _ = sweep_claims(input_data)
+    print(clean_claim_ids[0])
 
 
 # =====================================================================
@@ -1,146 +1,289 @@
+import heapq
 import os
 import re
-from collections import defaultdict, Counter
-from typing import List, Dict
+import tempfile
+from array import array
+from contextlib import ExitStack
+from itertools import islice, repeat
+from operator import add
+from typing import List, Dict, Iterable, Iterator, Optional
 
+INPUT_LOCATION = os.path.join(os.path.dirname(__file__), 'input.txt')
 
-class Guard:
-    """ Represents one of santa's guards. """
 
-    guard_begin_regex = (
-        r'^\[(?P<date>[0-9]+-[0-9]+-[0-9]+) '
-        r'(?P<time>[0-9]+:[0-9]+)\] '
-        r'Guard #(?P<guard_id>[0-9]+) begins shift$'
-    )
+class SleepMatrix:
+    """
+    A guards x 60 matrix of how many times each minute was slept through,
+    stored as one flat integer array, with a row for each guard.
+    """
 
-    falls_asleep_regex = (
-        r'^\[(?P<date>[0-9]+-[0-9]+-[0-9]+) '
-        r'(?P<time>[0-9]+:[0-9]+)\] falls asleep$'
-    )
+    minutes = 60
+
+    def __init__(self):
+        self.counts = array('l')
+
+    def add_row(self) -> int:
+        """ Adds an empty row to the matrix, and returns its index. """
+        self.counts.extend(repeat(0, self.minutes))
+        return len(self.counts) // self.minutes - 1
+
+    def row(self, row: int) -> array:
+        """ Returns a copy of the per-minute sleep counts for the row. """
+        return self.counts[row * self.minutes:(row + 1) * self.minutes]
+
+    def add_sleep(self, row: int, start_minute: int, end_minute: int):
+        """ Increments the sleep count of every minute in [start_minute, end_minute). """
+        start = row * self.minutes + start_minute
+        end = row * self.minutes + end_minute
+        self.counts[start:end] = array('l', map(add, self.counts[start:end], repeat(1)))
 
-    wakes_up_regex = (
+
+class Guard:
+    """ Represents one of santa's guards. """
+
+    # Classifies and extracts a log line of any kind in a single match.
+    log_regex = re.compile(
         r'^\[(?P<date>[0-9]+-[0-9]+-[0-9]+) '
-        r'(?P<time>[0-9]+:[0-9]+)\] wakes up$'
+        r'(?P<hour>[0-9]+):(?P<minute>[0-9]+)\] '
+        r'(?:Guard #(?P<guard_id>[0-9]+) begins shift'
+        r'|(?P<falls_asleep>falls asleep)'
+        r'|(?P<wakes_up>wakes up))$'
     )
 
-    def __init__(self, guard_id: int):
+    def __init__(self, guard_id: int, sleep_matrix: Optional[SleepMatrix] = None):
         self.guard_id = guard_id
-        self.sleep_dict = defaultdict(lambda: defaultdict(lambda: False))
+        self.sleep_matrix = sleep_matrix if sleep_matrix is not None else SleepMatrix()
+        self.row = self.sleep_matrix.add_row()
         self._total_sleep = None
         self._minute_most_slept = None
         self._most_slept_frequency = None
 
+    @property
+    def minute_counts(self) -> array:
+        """ How many times the guard slept through each minute. """
+        return self.sleep_matrix.row(self.row)
+
     @property
     def total_sleep(self) -> int:
-        if not self._total_sleep:
+        if self._total_sleep is None:
             self.calculate_total_sleep()
         return self._total_sleep
 
     @property
     def minute_most_slept(self) -> int:
-        if not self._minute_most_slept:
+        if self._minute_most_slept is None:
             self.calculate_minute_most_slept()
         return self._minute_most_slept
 
     @property
     def minute_frequency(self) -> int:
-        if not self._most_slept_frequency:
+        if self._most_slept_frequency is None:
             self.calculate_minute_most_slept()
         return self._most_slept_frequency
 
     def calculate_total_sleep(self):
         """ Calculates and stores the total minutes slept. """
-        self._total_sleep = 0
-        if len(self.sleep_dict) > 0:
-            for time_dict in self.sleep_dict.values():
-                self._total_sleep += sum(time_dict.values())
+        self._total_sleep = sum(self.minute_counts)
 
     def calculate_minute_most_slept(self):
         """ Calculates and stores the minute most slept, and its frequency. """
-        minute_dict = defaultdict(int)
-        for time_dict in self.sleep_dict.values():
-            for minute, did_sleep in time_dict.items():
-                minute_dict[minute] += 1 if did_sleep else 0
+        minute_counts = self.minute_counts
+        self._most_slept_frequency = max(minute_counts)
+        self._minute_most_slept = minute_counts.index(self._most_slept_frequency)
 
-        most_common = Counter(minute_dict).most_common(1)[0]
-        self._minute_most_slept, self._most_slept_frequency = most_common
-
-    def apply_sleep(self, start_minute: int, end_minute: int, date: str):
+    def apply_sleep(self, start_minute: int, end_minute: int):
         """
         Takes the minute fell asleep, and minute awoke,
-        and adds the sleep minutes to the sleep dict on the given date.
+        and adds the sleep minutes to the guard's row of the sleep matrix.
+
+        Any statistics already calculated are updated in place.
         """
-        for i in range(start_minute, end_minute):
-            self.sleep_dict[date][i] = True
+        self.sleep_matrix.add_sleep(self.row, start_minute, end_minute)
+
+        if self._total_sleep is not None:
+            self._total_sleep += max(end_minute - start_minute, 0)
+
+        if self._most_slept_frequency is not None:
+            row_start = self.row * self.sleep_matrix.minutes
+            for minute in range(start_minute, end_minute):
+                frequency = self.sleep_matrix.counts[row_start + minute]
+                if (frequency, -minute) > (self._most_slept_frequency, -self._minute_most_slept):
+                    self._most_slept_frequency = frequency
+                    self._minute_most_slept = minute
+
+
+class GuardLogAccumulator:
+    """
+    Accumulates guard sleep statistics from log lines as they arrive.
+
+    Lines must arrive in timestamp order, give or take `reorder_window`
+    lines, which are buffered and released oldest first.
+    """
+
+    def __init__(self, reorder_window: int = 0):
+        self.reorder_window = reorder_window
+        self.sleep_matrix = SleepMatrix()
+        self.guard_dict = {}
+        self.active_guard = None
+        self.sleep_time = None
+        self._buffer = []
+        self._received = 0
+        self._last_timestamp = None
+
+    def ingest(self, line: str):
+        """ Adds a log line, applying it once it leaves the reorder window. """
+        match = Guard.log_regex.match(line)
+        if not match:
+            raise ValueError(f'Value does not match regex `{Guard.log_regex.pattern}`')
+
+        timestamp = match.group('date', 'hour', 'minute')
+        heapq.heappush(self._buffer, (timestamp, self._received, match))
+        self._received += 1
+        while len(self._buffer) > self.reorder_window:
+            self._apply(*heapq.heappop(self._buffer))
+
+    def ingest_all(self, lines: Iterable[str]):
+        """ Adds every log line, then applies any still being buffered. """
+        for line in lines:
+            self.ingest(line)
+        self.flush()
+
+    def flush(self):
+        """ Applies every buffered log line. """
+        while self._buffer:
+            self._apply(*heapq.heappop(self._buffer))
+
+    def _apply(self, timestamp: tuple, _: int, match):
+        """ Applies a log line to the active guard. """
+        if self._last_timestamp is not None and timestamp < self._last_timestamp:
+            raise ValueError(f'Log line at {timestamp} arrived outside the reorder window')
+        self._last_timestamp = timestamp
+
+        if match.group('guard_id'):
+            guard_id = int(match.group('guard_id'))
+            if guard_id not in self.guard_dict:
+                self.guard_dict[guard_id] = Guard(guard_id, self.sleep_matrix)
+                # Start statistics at zero, so they are kept up to date from here.
+                self.guard_dict[guard_id].calculate_total_sleep()
+                self.guard_dict[guard_id].calculate_minute_most_slept()
+            self.active_guard = self.guard_dict[guard_id]
+
+        elif match.group('falls_asleep'):
+            # We know the next line is about the guard waking up.
+            self.sleep_time = int(match.group('minute'))
+        else:
+            # We know the previous line was about the guard falling asleep.
+            self.active_guard.apply_sleep(self.sleep_time, int(match.group('minute')))
+
+    def sleeping_guards(self) -> Dict[int, Guard]:
+        """ Returns the guards who have actually slept on their shift. """
+        return {k: v for k, v in self.guard_dict.items() if v.total_sleep}
+
+    def most_asleep_guard(self) -> Optional[Guard]:
+        """ Strategy one: the guard with the most minutes asleep, in O(guards). """
+        return max(self.sleeping_guards().values(), key=lambda x: x.total_sleep, default=None)
+
+    def most_regular_guard(self) -> Optional[Guard]:
+        """ Strategy two: the guard most frequently asleep on the same minute, in O(guards). """
+        return max(self.sleeping_guards().values(), key=lambda x: x.minute_frequency, default=None)
 
 
 def parse_input() -> List[str]:
     """ Reads the input file and returns a list of strings. """
-    file_location = os.path.join(os.path.dirname(__file__), 'input.txt')
     input_values = []
-    with open(file_location, 'r') as data:
+    with open(INPUT_LOCATION, 'r') as data:
         for line in data:
             input_values.append(line.strip())
     return input_values
 
 
-def parse_guard_data(input_data: List[str]) -> Dict[int, Guard]:
+def _merge_runs(run_paths: List[str], merged_path: str):
+    """ Merges sorted run files into a single sorted run file, removing the originals. """
+    with ExitStack() as stack, open(merged_path, 'w') as merged:
+        runs = [stack.enter_context(open(path, 'r')) for path in run_paths]
+        merged.writelines(heapq.merge(*runs))
+    for path in run_paths:
+        os.remove(path)
+
+
+def sort_log_external(file_location: str = INPUT_LOCATION, chunk_lines: int = 100000,
+                      fan_in: int = 16) -> Iterator[str]:
+    """
+    Yields the lines of an unsorted log file in timestamp order, without
+    holding more than `chunk_lines` raw lines in memory at once.
+
+    Each chunk is sorted and spilled to a temporary run file. Runs are then
+    merged `fan_in` at a time into longer runs until at most `fan_in` are
+    left, so no more than `fan_in + 1` files are ever open however large
+    the log is. Lines start with a fixed width timestamp, so sorting the
+    lines sorts by timestamp.
+    """
+    if fan_in < 2:
+        raise ValueError('At least two runs must be merged at a time')
+
+    with tempfile.TemporaryDirectory() as run_directory:
+        run_paths = []
+        with open(file_location, 'r') as data:
+            while True:
+                chunk = sorted(filter(None, (line.strip() for line in islice(data, chunk_lines))))
+                if not chunk:
+                    break
+                run_path = os.path.join(run_directory, f'run_{len(run_paths)}')
+                with open(run_path, 'w') as run:
+                    run.writelines(line + '\n' for line in chunk)
+                run_paths.append(run_path)
+
+        merge_pass = 0
+        while len(run_paths) > fan_in:
+            merge_pass += 1
+            merged_paths = []
+            for start in range(0, len(run_paths), fan_in):
+                merged_path = os.path.join(run_directory, f'merge_{merge_pass}_{len(merged_paths)}')
+                _merge_runs(run_paths[start:start + fan_in], merged_path)
+                merged_paths.append(merged_path)
+            run_paths = merged_paths
+
+        with ExitStack() as stack:
+            runs = [stack.enter_context(open(path, 'r')) for path in run_paths]
+            for line in heapq.merge(*runs):
+                yield line.rstrip('\n')
+
+
+def parse_guard_data(input_data: Iterable[str]) -> Dict[int, Guard]:
     """
-    Parses the guard sleep data, into Guard instances.
+    Parses the sorted guard sleep data, into Guard instances.
 
     Only returns guards who have actually slept on their shift.
     """
-    guard_dict = {}
-    active_guard = None
-    last_asleep_match = None
-
-    for line in input_data:
-        if re.match(Guard.guard_begin_regex, line):
-            guard_match = re.match(Guard.guard_begin_regex, line)
-
-            new_guard_id = int(guard_match.groupdict()['guard_id'])
-            if new_guard_id in guard_dict:
-                active_guard = guard_dict[new_guard_id]
-            else:
-                active_guard = Guard(int(new_guard_id))
-                guard_dict[active_guard.guard_id] = active_guard
-
-        elif re.match(Guard.falls_asleep_regex, line):
-            # We know the next line is about the guard waking up.
-            last_asleep_match = re.match(Guard.falls_asleep_regex, line)
-        else:
-            # We know the previous line was about the guard falling asleep.
-            wake_up_match = re.match(Guard.wakes_up_regex, line)
+    accumulator = GuardLogAccumulator()
+    accumulator.ingest_all(input_data)
+    return accumulator.sleeping_guards()
 
-            date = last_asleep_match.groupdict()['date']
-            sleep_time = int(last_asleep_match.groupdict()['time'].split(':')[1])
-            wake_time = int(wake_up_match.groupdict()['time'].split(':')[1])
-            active_guard.apply_sleep(sleep_time, wake_time, date)
 
-    return {k: v for k, v in guard_dict.items() if v.total_sleep}
+def stream_guard_data(file_location: str = INPUT_LOCATION, chunk_lines: int = 100000,
+                      fan_in: int = 16) -> Dict[int, Guard]:
+    """
+    Parses an unsorted guard log that may be larger than memory, feeding
+    the externally sorted lines straight into the guards.
+    """
+    return parse_guard_data(sort_log_external(file_location, chunk_lines, fan_in))
 
 
 # ============================ Part One ===============================
 
 
-def part_one(input_data: List[str]):
+def part_one(accumulator: GuardLogAccumulator):
     """ Puzzle Answer == 95199 """
-    guard_dict = parse_guard_data(input_data)
-
-    minutes_dict = dict(map(lambda x: (x[0], x[1].total_sleep), guard_dict.items()))
-    guard_id, _ = Counter(minutes_dict).most_common(1)[0]
-    print(guard_id * guard_dict[guard_id].minute_most_slept)
+    guard = accumulator.most_asleep_guard()
+    print(guard.guard_id * guard.minute_most_slept)
 
 
 # ============================ Part Two ===============================
 
 
-def part_two(input_data: List[str]):
+def part_two(accumulator: GuardLogAccumulator):
     """ Puzzle Answer == 7887 """
-    guard_dict = parse_guard_data(input_data)
-
-    minutes_dict = dict(map(lambda x: (x, x.minute_frequency), guard_dict.values()))
-    guard, _ = Counter(minutes_dict).most_common(1)[0]
+    guard = accumulator.most_regular_guard()
     print(guard.guard_id * guard.minute_most_slept)
 
 
@@ -150,5 +293,7 @@ def part_two(input_data: List[str]):
 if __name__ == '__main__':
     input_list = parse_input()
     input_list.sort()
-    part_one(input_list)
-    part_two(input_list)
+    guard_log = GuardLogAccumulator()
+    guard_log.ingest_all(input_list)
+    part_one(guard_log)
+    part_two(guard_log)
@@ -1,28 +1,212 @@
+import math
+import mmap
 import os
-from typing import List
+import string
+from multiprocessing import Pool
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+INPUT_LOCATION = os.path.join(os.path.dirname(__file__), 'input.txt')
+WHITESPACE = string.whitespace.encode('ascii')
+
+# The polymer being swept by each process in a `unit_removal_lengths` pool.
+_sweep_polymer = b''
+
+# The polymer being chunked by each process in a `reduce_polymer_parallel` pool.
+_chunk_polymer = b''
 
 
 def parse_input() -> List[str]:
     """ Reads the input file and returns a list of strings. """
-    file_location = os.path.join(os.path.dirname(__file__), 'input.txt')
     input_values = []
-    with open(file_location, 'r') as data:
+    with open(INPUT_LOCATION, 'r') as data:
         for line in data:
             input_values.append(line.strip())
     return input_values
 
 
-def collapse_string(input_str: str) -> str:
-    """ Collapses a polymer string. """
+def reduce_into(stack: bytearray, polymer: Union[bytes, bytearray]) -> bytearray:
+    """
+    Pushes each unit of the polymer onto the stack of already reduced units,
+    cancelling it against the top of the stack when the two react.
+
+    Units react when they are the same letter in opposite cases, which for
+    ASCII letters is exactly when they differ only by the 0x20 bit.
+    """
+    pop = stack.pop
+    push = stack.append
+    for unit in polymer:
+        if stack and stack[-1] ^ unit == 32:
+            pop()
+        else:
+            push(unit)
+    return stack
+
+
+def reduce_polymer(polymer: Union[bytes, bytearray]) -> bytearray:
+    """ Fully reduces an ASCII polymer in linear time. """
+    return reduce_into(bytearray(), polymer)
+
+
+def write_polymer(polymer: bytearray, output: BinaryIO, block_size: int = 1 << 20):
+    """ Writes the polymer out in blocks, without copying it. """
+    view = memoryview(polymer)
+    for start in range(0, len(view), block_size):
+        output.write(view[start:start + block_size])
+
+
+def reduce_polymer_stream(source: BinaryIO, block_size: int = 1 << 20,
+                          output: Optional[BinaryIO] = None) -> bytearray:
+    """
+    Fully reduces a polymer read from a binary stream or pipe, such as
+    `sys.stdin.buffer`, one block at a time.
+
+    Only the surviving reduced units are held in memory, so the input may be
+    larger than memory as long as the result is not. Any reduced unit can
+    still react with a later one, so nothing is final until the stream ends,
+    at which point the result is written to `output` in blocks if given.
+    """
+    stack = bytearray()
+    while True:
+        block = source.read(block_size)
+        if not block:
+            break
+        reduce_into(stack, block.translate(None, WHITESPACE))
+
+    if output is not None:
+        write_polymer(stack, output, block_size)
+    return stack
+
+
+def reduce_polymer_file(file_location: str = INPUT_LOCATION, block_size: int = 1 << 20,
+                        output: Optional[BinaryIO] = None) -> bytearray:
+    """ Fully reduces the polymer in a file, reading it in blocks through an mmap. """
+    stack = bytearray()
+    with open(file_location, 'rb') as data:
+        if os.fstat(data.fileno()).st_size:
+            with mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for start in range(0, len(mapped), block_size):
+                    reduce_into(stack, mapped[start:start + block_size].translate(None, WHITESPACE))
+
+    if output is not None:
+        write_polymer(stack, output, block_size)
+    return stack
+
+
+def merge_reduced(left: bytearray, right: Union[bytes, bytearray]) -> bytearray:
+    """
+    Joins two fully reduced polymers, which can only react across their
+    shared boundary, so the result is also fully reduced.
+    """
     index = 0
-    while index + 1 != len(input_str):
-        char1, char2 = input_str[index], input_str[index + 1]
-        if char1.lower() == char2.lower():
-            if sum([char1.islower(), char2.islower()]) == 1:
-                input_str = input_str[:index] + input_str[index + 2:]
-                index -= 2
+    while left and index < len(right) and left[-1] ^ right[index] == 32:
+        left.pop()
         index += 1
-    return input_str
+    left += right[index:]
+    return left
+
+
+def _chunk_bounds(length: int, chunks: int) -> Iterator[Tuple[int, int]]:
+    """ Yields the start and end offsets of up to `chunks` equal chunks covering the length. """
+    chunk_size = max(math.ceil(length / chunks), 1)
+    return ((start, min(start + chunk_size, length)) for start in range(0, length, chunk_size))
+
+
+def _init_chunk_reduce(polymer: Union[bytes, bytearray]):
+    """ Shares the polymer with a `reduce_polymer_parallel` worker process. """
+    global _chunk_polymer
+    _chunk_polymer = polymer
+
+
+def _reduce_chunk(bounds: Tuple[int, int]) -> bytearray:
+    """ Fully reduces the units of the shared polymer between the given offsets. """
+    start, end = bounds
+    return reduce_into(bytearray(), memoryview(_chunk_polymer)[start:end])
+
+
+def reduce_polymer_parallel(polymer: Union[bytes, bytearray], processes: Optional[int] = None,
+                            chunks: Optional[int] = None) -> bytearray:
+    """
+    Fully reduces a polymer by reducing chunks of it in a process pool and
+    merging the reduced chunks in order as they come back.
+
+    The polymer is handed to each worker once through the pool initializer,
+    so only the chunk offsets and the reduced chunks cross process
+    boundaries. Forked workers inherit it without a copy, but with the spawn
+    start method (the default on macOS and Windows) each worker receives a
+    pickled copy, so use `reduce_polymer_file_parallel` for large polymers.
+
+    Gives the same result as `reduce_polymer`, since reduction is associative.
+    """
+    processes = processes or os.cpu_count() or 1
+    reduced = bytearray()
+    with Pool(processes, initializer=_init_chunk_reduce, initargs=(polymer,)) as pool:
+        for piece in pool.imap(_reduce_chunk, _chunk_bounds(len(polymer), chunks or processes)):
+            merge_reduced(reduced, piece)
+    return reduced
+
+
+def _reduce_file_chunk(task: Tuple[str, int, int, int]) -> bytearray:
+    """ Fully reduces the units between the given offsets of a file, through the worker's own mmap. """
+    file_location, start, end, block_size = task
+    stack = bytearray()
+    with open(file_location, 'rb') as data:
+        with mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for block_start in range(start, end, block_size):
+                block_end = min(block_start + block_size, end)
+                reduce_into(stack, mapped[block_start:block_end].translate(None, WHITESPACE))
+    return stack
+
+
+def reduce_polymer_file_parallel(file_location: str = INPUT_LOCATION, processes: Optional[int] = None,
+                                 chunks: Optional[int] = None, block_size: int = 1 << 20) -> bytearray:
+    """
+    Fully reduces the polymer in a file by reducing chunks of it in a
+    process pool, and merging the reduced chunks in order as they come back.
+
+    Workers are only sent the file path and their chunk's offsets, and map
+    the file themselves, so nothing large is copied whichever start method
+    the pool uses.
+    """
+    size = os.path.getsize(file_location)
+    if not size:
+        return bytearray()
+
+    processes = processes or os.cpu_count() or 1
+    tasks = ((file_location, start, end, block_size) for start, end in _chunk_bounds(size, chunks or processes))
+    reduced = bytearray()
+    with Pool(processes) as pool:
+        for piece in pool.imap(_reduce_file_chunk, tasks):
+            merge_reduced(reduced, piece)
+    return reduced
+
+
+def _init_removal_sweep(polymer: Union[bytes, bytearray]):
+    """ Hands each pool process the polymer once, rather than once per unit. """
+    global _sweep_polymer
+    _sweep_polymer = polymer
+
+
+def _reduced_length_without(unit: str) -> Tuple[str, int]:
+    """ Returns the reduced length of the swept polymer with the unit type removed. """
+    filtered = _sweep_polymer.translate(None, (unit.lower() + unit.upper()).encode('ascii'))
+    return unit, len(reduce_polymer(filtered))
+
+
+def unit_removal_lengths(polymer: Union[bytes, bytearray], processes: Optional[int] = None) -> Dict[str, int]:
+    """
+    Returns the fully reduced length of the polymer with each unit type
+    removed, keyed by lowercase letter.
+
+    Removing a unit type commutes with reduction, so passing the already
+    reduced polymer gives the same lengths for far less work.
+    """
+    with Pool(processes, initializer=_init_removal_sweep, initargs=(bytes(polymer),)) as pool:
+        return dict(pool.map(_reduced_length_without, string.ascii_lowercase))
+
+
+def collapse_string(input_str: str) -> str:
+    """ Collapses a polymer string. """
+    return reduce_polymer(input_str.encode('ascii')).decode('ascii')
 
 
 # ============================ Part One ===============================
@@ -39,13 +223,9 @@ def part_one(input_data: List[str]):
 
 def part_two(input_data: List[str]):
     """ Puzzle Answer == 4098 """
-    lengths = []
-    alpha = 'abcdefghijklmnopqrstuvwxyz'
-    for char in alpha:
-        input_str = ''.join(a for a in input_data[0] if a.lower() != char)
-        collapsed_string = collapse_string(input_str)
-        lengths.append(len(collapsed_string))
-    print(min(lengths))
+    reduced_polymer = reduce_polymer(input_data[0].encode('ascii'))
+    lengths = unit_removal_lengths(reduced_polymer)
+    print(min(lengths.values()))
 
 
 # =====================================================================
@@ -1,7 +1,13 @@
 import math
 import os
-from collections import defaultdict
-from typing import List, Tuple, Optional
+from array import array
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Optional
+
+# Owner label for a location that is equally close to two or more co-ordinates.
+TIE = -1
+# Owner label for a location the flood fill has not reached yet.
+UNCLAIMED = -2
 
 
 def parse_input() -> List[str]:
@@ -45,55 +51,313 @@ def get_manhattan_sum(grid_coordinate: Tuple[int, int], node_list: List[Tuple[in
     return sum(distances)
 
 
-# ============================ Part One ===============================
+def parse_coordinates(input_data: List[str]) -> List[Tuple[int, int]]:
+    """ Converts lines of `x, y` into co-ordinate tuples. """
+    return list(map(lambda item: (int(item.split(',')[0]), int(item.split(',')[1])), input_data))
 
 
-def part_one(input_data: List[str]):
-    """ Puzzle Answer == 3722 """
-    coordinates = list(map(lambda item: (int(item.split(',')[0]), int(item.split(',')[1])), input_data))
-    max_x = max(coordinates, key=lambda x: x[0])[0]
-    max_y = max(coordinates, key=lambda x: x[1])[1]
-    grid_dict = defaultdict(lambda: [])
-
-    # Generate the grid dictionary.
-    for x in range(max_x):
-        for y in range(max_y):
-            closest_node = find_closest((x, y), coordinates)
-            if closest_node:
-                grid_dict[closest_node].append((x, y))
-
-    # Remove infinite areas from dictionary.
-    for node_tup, grid_list in grid_dict.items():
-        for x, y in grid_list:
-            if x in (0, max_x) or y in (0, max_y):
-                grid_dict[node_tup] = []
+def bounding_box(coordinates: List[Tuple[int, int]]) -> Tuple[int, int, int, int]:
+    """ Returns the min x, max x, min y and max y of the co-ordinates. """
+    x_values = [x for x, _ in coordinates]
+    y_values = [y for _, y in coordinates]
+    return min(x_values), max(x_values), min(y_values), max(y_values)
+
+
+def nearest_owner_rows(coordinates: List[Tuple[int, int]]) -> Iterator[List[int]]:
+    """
+    Yields the index of the closest co-ordinate for every location in each
+    row of the bounding box, or TIE, one row at a time.
+
+    Each row is a 1D distance transform: the co-ordinates are seeded into
+    the columns they sit in at their vertical distance from the row, and
+    two passes carry the closest seed rightwards and leftwards. The work per
+    row is proportional to the row width plus the number of co-ordinates.
+    """
+    min_x, max_x, min_y, max_y = bounding_box(coordinates)
+    width = max_x - min_x + 1
+
+    for y in range(min_y, max_y + 1):
+        seed_distance = [math.inf] * width
+        seed_owner = [TIE] * width
+        for index, (node_x, node_y) in enumerate(coordinates):
+            column = node_x - min_x
+            distance = abs(node_y - y)
+            if distance < seed_distance[column]:
+                seed_distance[column] = distance
+                seed_owner[column] = index
+            elif distance == seed_distance[column]:
+                seed_owner[column] = TIE
+
+        # Closest seed at or to the left of each column.
+        left_distance = [math.inf] * width
+        left_owner = [TIE] * width
+        distance, owner = math.inf, TIE
+        for column in range(width):
+            distance += 1
+            if seed_distance[column] < distance:
+                distance, owner = seed_distance[column], seed_owner[column]
+            elif seed_distance[column] == distance and seed_owner[column] != owner:
+                owner = TIE
+            left_distance[column] = distance
+            left_owner[column] = owner
+
+        # Combine with the closest seed at or to the right of each column.
+        row = left_owner
+        distance, owner = math.inf, TIE
+        for column in range(width - 1, -1, -1):
+            distance += 1
+            if seed_distance[column] < distance:
+                distance, owner = seed_distance[column], seed_owner[column]
+            elif seed_distance[column] == distance and seed_owner[column] != owner:
+                owner = TIE
+            if distance < left_distance[column]:
+                row[column] = owner
+            elif distance == left_distance[column] and owner != row[column]:
+                row[column] = TIE
+        yield row
+
+
+def region_areas(coordinates: List[Tuple[int, int]]) -> List[Optional[int]]:
+    """
+    Returns the area of the region closest to each co-ordinate, counted a
+    row at a time so memory stays bounded by the width of the grid.
+
+    Regions touching the edge of the bounding box are infinite, and None.
+    """
+    _, _, min_y, max_y = bounding_box(coordinates)
+    areas = [0] * len(coordinates)
+    infinite = set()
+    for y, row in enumerate(nearest_owner_rows(coordinates), min_y):
+        for owner in row:
+            if owner != TIE:
+                areas[owner] += 1
+        if y in (min_y, max_y):
+            infinite.update(row)
+        else:
+            infinite.update((row[0], row[-1]))
+
+    return [None if index in infinite else area for index, area in enumerate(areas)]
+
+
+def flood_owner_labels(coordinates: List[Tuple[int, int]]) -> array:
+    """
+    Labels every location in the bounding box with the index of its closest
+    co-ordinate, or TIE, by flooding outwards from all co-ordinates at once.
+
+    Each breadth first step is one more unit of manhattan distance, so a
+    location is closest to whichever co-ordinates reach it first. A location
+    reached in the same step by different owners, or from a tie, is a tie.
+    Every location is labelled once, however many co-ordinates there are.
+
+    Returns the labels as a row major int32 array.
+    """
+    min_x, max_x, min_y, max_y = bounding_box(coordinates)
+    width = max_x - min_x + 1
+    height = max_y - min_y + 1
+    labels = array('i', [UNCLAIMED]) * (width * height)
+
+    frontier: Dict[int, int] = {}
+    for index, (x, y) in enumerate(coordinates):
+        cell = (y - min_y) * width + (x - min_x)
+        frontier[cell] = TIE if cell in frontier else index
+
+    while frontier:
+        for cell, owner in frontier.items():
+            labels[cell] = owner
+
+        next_frontier: Dict[int, int] = {}
+        for cell, owner in frontier.items():
+            row, column = divmod(cell, width)
+            neighbours = []
+            if column > 0:
+                neighbours.append(cell - 1)
+            if column < width - 1:
+                neighbours.append(cell + 1)
+            if row > 0:
+                neighbours.append(cell - width)
+            if row < height - 1:
+                neighbours.append(cell + width)
+
+            for neighbour in neighbours:
+                if labels[neighbour] == UNCLAIMED:
+                    if next_frontier.get(neighbour, owner) != owner:
+                        next_frontier[neighbour] = TIE
+                    else:
+                        next_frontier[neighbour] = owner
+        frontier = next_frontier
+
+    return labels
+
+
+def flood_region_areas(coordinates: List[Tuple[int, int]]) -> List[Optional[int]]:
+    """
+    Returns the area of the region closest to each co-ordinate, using the
+    flood filled labels.
+
+    Regions touching the edge of the bounding box are infinite, and None.
+    """
+    min_x, max_x, _, _ = bounding_box(coordinates)
+    width = max_x - min_x + 1
+    labels = flood_owner_labels(coordinates)
+
+    counts = Counter(labels)
+    infinite = set(labels[:width]) | set(labels[-width:])
+    infinite.update(labels[::width])
+    infinite.update(labels[width - 1::width])
+
+    return [None if index in infinite else counts[index] for index in range(len(coordinates))]
+
+
+# Interchangeable ways of calculating the areas for part one.
+AREA_ENGINES: Dict[str, Callable[[List[Tuple[int, int]]], List[Optional[int]]]] = {
+    'rows': region_areas,
+    'flood': flood_region_areas,
+}
+
+
+class ManhattanIndex:
+    """
+    A grid of square buckets over the co-ordinates, for finding the
+    closest co-ordinate to arbitrary points without scanning them all.
+
+    Buckets are searched in rings of growing size around the point's
+    bucket, stopping once no further ring can hold anything as close.
+    """
+
+    def __init__(self, coordinates: List[Tuple[int, int]]):
+        self.coordinates = list(coordinates)
+        self.buckets: Dict[Tuple[int, int], List[int]] = {}
+        if not self.coordinates:
+            return
+
+        self.min_x, max_x, self.min_y, max_y = bounding_box(self.coordinates)
+        area = (max_x - self.min_x + 1) * (max_y - self.min_y + 1)
+        # Aim for about one co-ordinate per bucket.
+        self.bucket_size = max(int(math.sqrt(area / len(self.coordinates))), 1)
+        for index, point in enumerate(self.coordinates):
+            self.buckets.setdefault(self.bucket_of(point), []).append(index)
+
+        self.last_bucket_x, self.last_bucket_y = self.bucket_of((max_x, max_y))
+
+    def bucket_of(self, point: Tuple[int, int]) -> Tuple[int, int]:
+        """ Returns the bucket the point falls in. """
+        return (point[0] - self.min_x) // self.bucket_size, (point[1] - self.min_y) // self.bucket_size
+
+    def ring(self, centre: Tuple[int, int], radius: int) -> Iterator[Tuple[int, int]]:
+        """ Yields the occupied buckets exactly `radius` buckets from the centre. """
+        centre_x, centre_y = centre
+        low_y = max(centre_y - radius, 0)
+        high_y = min(centre_y + radius, self.last_bucket_y)
+        for bucket_x in range(max(centre_x - radius, 0), min(centre_x + radius, self.last_bucket_x) + 1):
+            if abs(bucket_x - centre_x) == radius:
+                bucket_ys = range(low_y, high_y + 1)
+            else:
+                bucket_ys = [y for y in (centre_y - radius, centre_y + radius) if low_y <= y <= high_y]
+            for bucket_y in bucket_ys:
+                if (bucket_x, bucket_y) in self.buckets:
+                    yield bucket_x, bucket_y
+
+    def query_index(self, point: Tuple[int, int]) -> int:
+        """ Returns the index of the co-ordinate closest to the point, or TIE. """
+        if not self.coordinates:
+            return TIE
+
+        centre_x, centre_y = self.bucket_of(point)
+        first_ring = max(-centre_x, centre_x - self.last_bucket_x, -centre_y, centre_y - self.last_bucket_y, 0)
+        last_ring = max(centre_x, self.last_bucket_x - centre_x, centre_y, self.last_bucket_y - centre_y)
+
+        closest = TIE
+        shortest_distance = math.inf
+        for radius in range(first_ring, last_ring + 1):
+            # Anything in this ring is at least this far away along one axis.
+            if radius and (radius - 1) * self.bucket_size + 1 > shortest_distance:
                 break
+            for bucket in self.ring((centre_x, centre_y), radius):
+                for index in self.buckets[bucket]:
+                    distance = manhattan_distance(self.coordinates[index], point)
+                    if distance < shortest_distance:
+                        closest = index
+                        shortest_distance = distance
+                    elif distance == shortest_distance:
+                        closest = TIE
+        return closest
 
-    # Find the largest area.
-    highest_area = 0
-    for key, val in grid_dict.items():
-        if len(val) > highest_area:
-            highest_area = len(val)
+    def query(self, point: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        """
+        Returns the co-ordinate closest to the point, exactly as `find_closest`.
+        Returns None if two co-ordinates are the same distance.
+        """
+        index = self.query_index(point)
+        return None if index == TIE else self.coordinates[index]
 
-    print(highest_area)
+    def query_indices(self, points: Iterable[Tuple[int, int]]) -> array:
+        """ Returns an int32 array of the closest co-ordinate index, or TIE, for each point. """
+        return array('i', map(self.query_index, points))
 
 
-# ============================ Part Two ===============================
+def axis_costs(values: List[int], low: int, high: int) -> List[int]:
+    """
+    Returns the sum of distances from each position in [low, high] to all
+    of the given values along one axis.
 
+    Each step right adds one for every value at or behind the position,
+    and takes one off for every value ahead of it.
+    """
+    sorted_values = sorted(values)
+    cost = sum(abs(value - low) for value in sorted_values)
+    behind = 0
+    costs = []
+    for position in range(low, high + 1):
+        while behind < len(sorted_values) and sorted_values[behind] <= position:
+            behind += 1
+        costs.append(cost)
+        cost += 2 * behind - len(sorted_values)
+    return costs
+
+
+def count_region_within(coordinates: List[Tuple[int, int]], threshold: int = 10000) -> int:
+    """
+    Counts the locations whose total manhattan distance to all of the
+    co-ordinates is less than the threshold.
+
+    The total splits into an x cost plus a y cost. A location d past the
+    bounding box costs at least d per co-ordinate, so each axis is widened
+    by the most that can stay under the threshold. Pairs of axis costs are
+    then counted with two pointers over the sorted costs.
+    """
+    if not coordinates or threshold <= 0:
+        return 0
+
+    min_x, max_x, min_y, max_y = bounding_box(coordinates)
+    margin = (threshold - 1) // len(coordinates)
+    x_costs = sorted(axis_costs([x for x, _ in coordinates], min_x - margin, max_x + margin), reverse=True)
+    y_costs = sorted(axis_costs([y for _, y in coordinates], min_y - margin, max_y + margin))
 
-def part_two(input_data: List[str]):
-    """ Puzzle Answer == 44634 """
-    coordinates = list(map(lambda item: (int(item.split(',')[0]), int(item.split(',')[1])), input_data))
-    max_x = max(coordinates, key=lambda x: x[0])[0]
-    max_y = max(coordinates, key=lambda x: x[1])[1]
     total_area = 0
+    y_within = 0
+    for x_cost in x_costs:
+        # x costs only fall, so the y costs that fit only grow.
+        while y_within < len(y_costs) and x_cost + y_costs[y_within] < threshold:
+            y_within += 1
+        total_area += y_within
+    return total_area
 
-    for x in range(max_x):
-        for y in range(max_y):
-            if get_manhattan_sum((x, y), coordinates) < 10000:
-                total_area += 1
 
-    print(total_area)
+# ============================ Part One ===============================
+
+
+def part_one(input_data: List[str], engine: str = 'rows'):
+    """ Puzzle Answer == 3722 """
+    areas = AREA_ENGINES[engine](parse_coordinates(input_data))
+    print(max((area for area in areas if area is not None), default=0))
+
+
+# ============================ Part Two ===============================
+
+
+def part_two(input_data: List[str], threshold: int = 10000):
+    """ Puzzle Answer == 44634 """
+    print(count_region_within(parse_coordinates(input_data), threshold))
 
 
 # =====================================================================
@@ -1,117 +1,241 @@
+import heapq
+import math
 import os
 import re
 import string
-from typing import List, Set
-
-import math
+from array import array
+from itertools import accumulate
+from multiprocessing import Pool
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
 
 INSTRUCTION_RE = re.compile(
-    r'Step (?P<before>[A-Z]) must be finished before step (?P<after>[A-Z]) can begin.'
+    r'Step (?P<before>\S+) must be finished before step (?P<after>\S+) can begin\.'
 )
 
+# The graph and durations simulated by each process in a `sweep_worker_counts` pool.
+_sweep_graph = None
+_sweep_duration = None
+
+
+def default_task_duration(name: str, base_length: int = 60) -> int:
+    """
+    Returns how long a task takes by default, based on its letter.
+
+    Only single letter task names have a default duration, any other graph
+    needs an explicit `task_duration`.
+    """
+    if len(name) != 1 or name not in string.ascii_uppercase:
+        raise ValueError(f'No default duration for task `{name}`, pass a task_duration')
+    return string.ascii_uppercase.index(name) + base_length + 1
 
-class TaskNode:
-    """ Represents a task to be executed. """
+
+class ScheduledTask(NamedTuple):
+    """ When, and by which worker, a task was executed. """
 
     name: str
-    before_tasks: Set['TaskNode']
-    next_tasks: Set['TaskNode']
-    time_started: int
-
-    def __init__(self, name, base_length):
-        self.name = name
-        self.base_length = base_length
-        self.before_tasks = set()
-        self.next_tasks = set()
-        self.time_started = 0
-
-    def time_left(self, current_time):
-        """ Returns the length the task will take. """
-        total_length = string.ascii_uppercase.find(self.name) + self.base_length + 1
-        return total_length - (current_time - self.time_started)
-
-    def can_execute(self, current_task_order: str) -> bool:
-        """ Checks if the task can be executed, given the tasks that have already run. """
-        for task in self.before_tasks:
-            if task.name not in current_task_order:
-                return False
-        return True
-
-
-class TaskNodeExecutor:
-    """ Executes TaskNodes in the correct order. """
-
-    available_tasks: Set[TaskNode]
-    available_workers: int
-    executed_tasks: str
-
-    def __init__(self, available_tasks: Set[TaskNode]):
-        self.available_tasks = available_tasks
-        self.available_workers = 0
-        self.executed_tasks = ''
-
-    def execute_task(self, task: TaskNode):
-        """ Executes a task, and adds its next tasks to available tasks. """
-        self.executed_tasks += task.name
-        for item in task.next_tasks:
-            self.available_tasks.add(item)
-
-    def get_next_task(self) -> TaskNode:
-        """ Returns the next executable task. """
-        next_task = None
-        executable_tasks = [task for task in self.available_tasks if task.can_execute(self.executed_tasks)]
-        if executable_tasks:
-            executable_tasks.sort(key=lambda x: x.name)
-            next_task = executable_tasks[0]
-        return next_task
-
-    def execute_all_tasks(self) -> str:
-        """ Executes all tasks and returns the oder they were run in. """
-        while self.available_tasks:
-            next_task = self.get_next_task()
-            self.available_tasks.remove(next_task)
-            self.execute_task(next_task)
-        return self.executed_tasks
-
-    def execute_all_tasks_divided(self, num_of_workers: int) -> int:
-        """ Divides tasks between given workers and executes based on time. """
-        self.available_workers = num_of_workers
-        total_time = 0
-        tasks_in_progress = []
-        while self.available_tasks or tasks_in_progress:
-
-            shortest_time_left = math.inf
-            tasks_in_progress.sort(key=lambda x: x.time_left(total_time), reverse=False)
-
-            # Finish tasks in progress.
-            for task in tasks_in_progress:
-                if task.time_left(total_time) <= shortest_time_left:
-                    shortest_time_left = task.time_left(total_time)
-                    self.available_workers += 1
-                    self.execute_task(task)
-                    tasks_in_progress.remove(task)
-
-            if shortest_time_left != math.inf:
-                total_time += shortest_time_left
-
-            # Assign workers to tasks
-            next_task = self.get_next_task()
-            while self.available_workers and next_task:
-                self.available_tasks.remove(next_task)
-                tasks_in_progress.append(next_task)
-                self.available_workers -= 1
-                next_task.time_started = total_time
-                next_task = self.get_next_task()
-
-        return total_time
-
-
-class DefaultTaskDict(dict):
-    """ A dictionary that returns an instantiated TaskNode by default. """
-
-    def __missing__(self, key: str):
-        res = self[key] = TaskNode(key, 60)
-        return res
+    worker: int
+    start: int
+    end: int
+
+
+class TaskSchedule(NamedTuple):
+    """ The total time taken to execute every task, and when each one ran. """
+
+    makespan: int
+    tasks: List[ScheduledTask]
+
+
+class CompiledTaskGraph:
+    """
+    An immutable task graph, compiled once and reusable for any number of runs.
+
+    Task names are interned to integer ids in name order, so a min-heap of ids
+    gives the same order as a min-heap of names. The edges are stored in CSR
+    form: the next tasks of task `i` are `targets[offsets[i]:offsets[i + 1]]`.
+    """
+
+    names: List[str]
+    offsets: array
+    targets: array
+    in_degrees: array
+
+    def __init__(self, names: List[str], offsets: array, targets: array, in_degrees: array):
+        self.names = names
+        self.offsets = offsets
+        self.targets = targets
+        self.in_degrees = in_degrees
+
+    @classmethod
+    def from_instructions(cls, instructions: Iterable[str]) -> 'CompiledTaskGraph':
+        """ Compiles instructions of the form `Step A must be finished before step B can begin.` """
+        edges = set()
+        for instruction in instructions:
+            match = INSTRUCTION_RE.match(instruction)
+            if not match:
+                raise ValueError(f'Value does not match regex `{INSTRUCTION_RE.pattern}`')
+            edges.add(match.group('before', 'after'))
+
+        names = sorted({name for edge in edges for name in edge})
+        task_ids = {name: task_id for task_id, name in enumerate(names)}
+        id_edges = sorted((task_ids[before], task_ids[after]) for before, after in edges)
+
+        out_degrees = array('i', bytes(4 * len(names)))
+        in_degrees = array('i', bytes(4 * len(names)))
+        for before, after in id_edges:
+            out_degrees[before] += 1
+            in_degrees[after] += 1
+
+        offsets = array('i', [0])
+        offsets.extend(accumulate(out_degrees))
+        targets = array('i', (after for _, after in id_edges))
+        return cls(names, offsets, targets, in_degrees)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def next_tasks(self, task_id: int) -> array:
+        """ Returns the ids of the tasks that wait on the given task. """
+        return self.targets[self.offsets[task_id]:self.offsets[task_id + 1]]
+
+    def _release(self, task_id: int, waiting_on: array, ready_tasks: List[int]):
+        """ Marks a task finished, adding any next tasks it was the last blocker of to the ready heap. """
+        for next_id in self.next_tasks(task_id):
+            waiting_on[next_id] -= 1
+            if not waiting_on[next_id]:
+                heapq.heappush(ready_tasks, next_id)
+
+    def _start(self) -> Tuple[array, List[int]]:
+        """ Returns fresh per run in-degree counters, and a heap of the tasks ready to run. """
+        return array('i', self.in_degrees), [task_id for task_id, degree in enumerate(self.in_degrees) if not degree]
+
+    def task_order(self) -> List[str]:
+        """ Returns the task names in the order a single worker executes them. """
+        waiting_on, ready_tasks = self._start()
+        order = []
+        while ready_tasks:
+            task_id = heapq.heappop(ready_tasks)
+            order.append(self.names[task_id])
+            self._release(task_id, waiting_on, ready_tasks)
+
+        if len(order) != len(self.names):
+            raise ValueError('The task graph contains a cycle')
+        return order
+
+    def simulate(self, num_of_workers: int, task_duration: Callable[[str], int] = default_task_duration) -> TaskSchedule:
+        """
+        Divides tasks between the given workers, as a discrete event simulation.
+
+        Time jumps straight from one batch of task completions to the next.
+        Whenever workers are free, the lowest numbered ones are handed the
+        next executable tasks. `task_duration` maps a task name to how long
+        it takes.
+        """
+        if num_of_workers < 1:
+            raise ValueError('At least one worker is needed to execute tasks')
+
+        waiting_on, ready_tasks = self._start()
+        free_workers = list(range(num_of_workers))
+        completions: List[Tuple[int, int, int]] = []
+        scheduled_tasks = []
+        current_time = 0
+
+        while True:
+            # Assign free workers to tasks.
+            while free_workers and ready_tasks:
+                task_id = heapq.heappop(ready_tasks)
+                worker = heapq.heappop(free_workers)
+                end_time = current_time + task_duration(self.names[task_id])
+                heapq.heappush(completions, (end_time, task_id, worker))
+                scheduled_tasks.append(ScheduledTask(self.names[task_id], worker, current_time, end_time))
+
+            if not completions:
+                break
+
+            # Finish every task in progress that completes at the next event time.
+            current_time = completions[0][0]
+            while completions and completions[0][0] == current_time:
+                _, task_id, worker = heapq.heappop(completions)
+                self._release(task_id, waiting_on, ready_tasks)
+                heapq.heappush(free_workers, worker)
+
+        if len(scheduled_tasks) != len(self.names):
+            raise ValueError('The task graph contains a cycle')
+        return TaskSchedule(current_time, scheduled_tasks)
+
+    def critical_path(self, task_duration: Callable[[str], int] = default_task_duration) -> Tuple[int, int]:
+        """
+        Returns the length of the longest chain of dependent tasks, and the
+        total work across all tasks, in a single O(V + E) pass.
+
+        No number of workers can finish sooner than the critical path, and
+        K workers can not finish sooner than the total work divided by K.
+        """
+        waiting_on, ready_tasks = self._start()
+        earliest_start = [0] * len(self.names)
+        critical_path = 0
+        total_work = 0
+        processed = 0
+        while ready_tasks:
+            task_id = ready_tasks.pop()
+            processed += 1
+            length = task_duration(self.names[task_id])
+            finish = earliest_start[task_id] + length
+            critical_path = max(critical_path, finish)
+            total_work += length
+            for next_id in self.next_tasks(task_id):
+                earliest_start[next_id] = max(earliest_start[next_id], finish)
+                waiting_on[next_id] -= 1
+                if not waiting_on[next_id]:
+                    ready_tasks.append(next_id)
+
+        if processed != len(self.names):
+            raise ValueError('The task graph contains a cycle')
+        return critical_path, total_work
+
+
+class WorkerSweep(NamedTuple):
+    """ The makespan for each number of workers simulated, and the bounds on it. """
+
+    makespans: Dict[int, int]
+    critical_path: int
+    total_work: int
+
+    def lower_bound(self, num_of_workers: int) -> int:
+        """ Returns the shortest makespan possible with the given number of workers. """
+        return max(self.critical_path, math.ceil(self.total_work / num_of_workers))
+
+
+def _init_worker_sweep(task_graph: CompiledTaskGraph, task_duration: Callable[[str], int]):
+    """ Hands each pool process the graph once, rather than once per worker count. """
+    global _sweep_graph, _sweep_duration
+    _sweep_graph = task_graph
+    _sweep_duration = task_duration
+
+
+def _sweep_makespan(num_of_workers: int) -> int:
+    """ Returns the makespan of the swept graph with the given number of workers. """
+    return _sweep_graph.simulate(num_of_workers, _sweep_duration).makespan
+
+
+def sweep_worker_counts(task_graph: CompiledTaskGraph, max_workers: int,
+                        task_duration: Callable[[str], int] = default_task_duration,
+                        processes: Optional[int] = None) -> WorkerSweep:
+    """
+    Simulates 1 to `max_workers` workers concurrently in a process pool.
+
+    Stops at the first worker count whose makespan reaches the critical
+    path, as adding more workers can not beat it. `task_duration` must be
+    picklable, such as a module level function.
+    """
+    critical_path, total_work = task_graph.critical_path(task_duration)
+    makespans = {}
+    worker_counts = range(1, max_workers + 1)
+    with Pool(processes, initializer=_init_worker_sweep, initargs=(task_graph, task_duration)) as pool:
+        for num_of_workers, makespan in zip(worker_counts, pool.imap(_sweep_makespan, worker_counts)):
+            makespans[num_of_workers] = makespan
+            if makespan <= critical_path:
+                break
+    return WorkerSweep(makespans, critical_path, total_work)
 
 
 def parse_input() -> List[str]:
@@ -127,20 +251,9 @@ def parse_input() -> List[str]:
 # ============================ Part One ===============================
 
 
-def part_one(input_data: List[str]):
+def part_one(task_graph: CompiledTaskGraph):
     """ Puzzle Answer == CFMNLOAHRKPTWBJSYZVGUQXIDE """
-    task_node_dict = DefaultTaskDict()
-
-    for instruction in input_data:
-        group_dict = INSTRUCTION_RE.match(instruction).groupdict()
-        before = task_node_dict[group_dict['before']]
-        after = task_node_dict[group_dict['after']]
-        before.next_tasks.add(after)
-        after.before_tasks.add(before)
-
-    available_tasks = set(task for task in task_node_dict.values() if not task.before_tasks)
-    executor = TaskNodeExecutor(available_tasks)
-    task_order = executor.execute_all_tasks()
+    task_order = ''.join(task_graph.task_order())
 
     print(task_order)
 
@@ -148,20 +261,9 @@ def part_one(input_data: List[str]):
 # ============================ Part Two ===============================
 
 
-def part_two(input_data: List[str]):
+def part_two(task_graph: CompiledTaskGraph):
     """ Puzzle Answer == 971 """
-    task_node_dict = DefaultTaskDict()
-
-    for instruction in input_data:
-        group_dict = INSTRUCTION_RE.match(instruction).groupdict()
-        before = task_node_dict[group_dict['before']]
-        after = task_node_dict[group_dict['after']]
-        before.next_tasks.add(after)
-        after.before_tasks.add(before)
-
-    available_tasks = set(task for task in task_node_dict.values() if not task.before_tasks)
-    executor = TaskNodeExecutor(available_tasks)
-    task_execution_time = executor.execute_all_tasks_divided(5)
+    task_execution_time = task_graph.simulate(5).makespan
 
     print(task_execution_time)
 
@@ -171,5 +273,6 @@ def part_two(input_data: List[str]):
 
 if __name__ == '__main__':
     input_list = parse_input()
-    part_one(input_list)
-    part_two(input_list)
+    compiled_graph = CompiledTaskGraph.from_instructions(input_list)
+    part_one(compiled_graph)
+    part_two(compiled_graph)
@@ -1,5 +1,7 @@
 import os
-from typing import List
+from array import array
+from itertools import repeat
+from typing import List, Optional, Sequence
 
 
 class TreeNode:
@@ -17,37 +19,164 @@ class TreeNode:
         self.metadata = []
 
     def init_node(self, tree_data_list: List[int]) -> List[int]:
-        """ Takes a list of node data, and populates the node variables. """
-        self.number_of_children = tree_data_list.pop(0)
-        self.number_of_metadata = tree_data_list.pop(0)
-        for i in range(self.number_of_children):
-            new_node = TreeNode()
-            tree_data_list = new_node.init_node(tree_data_list)
-            self.child_nodes.append(new_node)
-        self.metadata = tree_data_list[0:self.number_of_metadata]
-        tree_data_list = tree_data_list[self.number_of_metadata:]
-        return tree_data_list
+        """
+        Takes a list of node data, and populates the node variables.
+
+        Returns the data left over after this node and all of its children.
+        """
+        cursor = self.parse(tree_data_list)
+        return tree_data_list[cursor:]
+
+    def parse(self, tree_data: Sequence[int], cursor: int = 0) -> int:
+        """
+        Populates the node and all of its children from the data starting at
+        the cursor, and returns the cursor just past the node.
+
+        Walks the data with a single cursor and an explicit stack of nodes
+        still waiting on children, so it takes linear time and works for
+        trees of any depth.
+        """
+        self.number_of_children = tree_data[cursor]
+        self.number_of_metadata = tree_data[cursor + 1]
+        cursor += 2
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            if len(node.child_nodes) < node.number_of_children:
+                child = TreeNode()
+                child.number_of_children = tree_data[cursor]
+                child.number_of_metadata = tree_data[cursor + 1]
+                cursor += 2
+                node.child_nodes.append(child)
+                stack.append(child)
+            else:
+                node.metadata = list(tree_data[cursor:cursor + node.number_of_metadata])
+                cursor += node.number_of_metadata
+                stack.pop()
+        return cursor
+
+    def _subtree_nodes(self) -> List['TreeNode']:
+        """ Returns the node and all of its descendants, with every parent before its children. """
+        nodes = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node.child_nodes)
+        return nodes
 
     def get_node_value(self) -> int:
-        """ Returns the value of the node. """
-        node_value = 0
-
-        if not self.child_nodes:
-            node_value = sum(self.metadata)
-        else:
-            for meta_value in self.metadata:
-                if meta_value <= len(self.child_nodes):
-                    node_value += self.child_nodes[meta_value - 1].get_node_value()
-
-        return node_value
+        """
+        Returns the value of the node.
+
+        Values are worked out children first, from a reversed walk of the
+        subtree, so it works for trees of any depth.
+        """
+        node_values = {}
+        for node in reversed(self._subtree_nodes()):
+            if not node.child_nodes:
+                node_values[node] = sum(node.metadata)
+            else:
+                child_count = len(node.child_nodes)
+                node_values[node] = sum(
+                    node_values[node.child_nodes[meta_value - 1]]
+                    for meta_value in node.metadata
+                    if 1 <= meta_value <= child_count
+                )
+        return node_values[self]
 
     def sum_metadata(self) -> int:
         """ Returns the sum of all metadata from the node including all children. """
-        child_metadata_sum = 0
-        for child in self.child_nodes:
-            child_metadata_sum += child.sum_metadata()
-        child_metadata_sum += sum(self.metadata)
-        return child_metadata_sum
+        return sum(sum(node.metadata) for node in self._subtree_nodes())
+
+
+class FlatTree:
+    """
+    A whole tree stored as parallel int arrays, indexed by node id in the
+    order the nodes appear in the data.
+
+    The children of node `n` are `child_ids[first_child[n]:first_child[n] + child_counts[n]]`,
+    and its metadata is `tree_data[metadata_offsets[n]:metadata_offsets[n] + metadata_lengths[n]]`.
+    """
+
+    def __init__(self, tree_data: Sequence[int]):
+        self.tree_data = array('q', tree_data)
+        self.child_counts = array('i')
+        self.metadata_offsets = array('q')
+        self.metadata_lengths = array('i')
+        self.first_child = array('q')
+        self.child_ids = array('i')
+        self._node_values: Optional[array] = None
+        self.parse()
+
+    def __len__(self) -> int:
+        return len(self.child_counts)
+
+    def _add_node(self, cursor: int) -> int:
+        """ Adds the node whose header is at the cursor, and returns its id. """
+        node_id = len(self.child_counts)
+        self.child_counts.append(self.tree_data[cursor])
+        self.metadata_lengths.append(self.tree_data[cursor + 1])
+        self.metadata_offsets.append(0)
+        self.first_child.append(len(self.child_ids))
+        self.child_ids.extend(repeat(0, self.tree_data[cursor]))
+        return node_id
+
+    def parse(self):
+        """ Fills the arrays with a single cursor and an explicit stack. """
+        stack = [self._add_node(0)]
+        children_added = [0]
+        cursor = 2
+        while stack:
+            node_id = stack[-1]
+            if children_added[-1] < self.child_counts[node_id]:
+                child_id = self._add_node(cursor)
+                cursor += 2
+                self.child_ids[self.first_child[node_id] + children_added[-1]] = child_id
+                children_added[-1] += 1
+                stack.append(child_id)
+                children_added.append(0)
+            else:
+                self.metadata_offsets[node_id] = cursor
+                cursor += self.metadata_lengths[node_id]
+                stack.pop()
+                children_added.pop()
+
+    def metadata(self, node_id: int) -> array:
+        """ Returns the metadata of the node. """
+        offset = self.metadata_offsets[node_id]
+        return self.tree_data[offset:offset + self.metadata_lengths[node_id]]
+
+    def sum_metadata(self) -> int:
+        """ Returns the sum of all metadata in the tree. """
+        return sum(sum(self.metadata(node_id)) for node_id in range(len(self)))
+
+    def node_values(self) -> array:
+        """
+        Returns the value of every node, filled in one pass that visits
+        children before their parents, so each child value is only
+        calculated once however many times it is referenced.
+        """
+        if self._node_values is None:
+            values = array('q', repeat(0, len(self)))
+            # Children always come after their parent in the data.
+            for node_id in range(len(self) - 1, -1, -1):
+                child_count = self.child_counts[node_id]
+                if not child_count:
+                    values[node_id] = sum(self.metadata(node_id))
+                else:
+                    first_child = self.first_child[node_id]
+                    values[node_id] = sum(
+                        values[self.child_ids[first_child + meta_value - 1]]
+                        for meta_value in self.metadata(node_id)
+                        if 1 <= meta_value <= child_count
+                    )
+            self._node_values = values
+        return self._node_values
+
+    def get_node_value(self, node_id: int = 0) -> int:
+        """ Returns the value of the node, the root by default. """
+        return self.node_values()[node_id]
 
 
 def parse_input() -> List[str]:
@@ -66,10 +195,9 @@ def parse_input() -> List[str]:
 def part_one(input_data: List[str]):
     """ Puzzle Answer == 38567 """
     tree_data = list(map(int, input_data[0].split(' ')))
-    root_node = TreeNode()
-    root_node.init_node(tree_data)
+    tree = FlatTree(tree_data)
 
-    metadata_sum = root_node.sum_metadata()
+    metadata_sum = tree.sum_metadata()
 
     print(metadata_sum)
 
@@ -80,10 +208,9 @@ def part_one(input_data: List[str]):
 def part_two(input_data: List[str]):
     """ Puzzle Answer == 24453 """
     tree_data = list(map(int, input_data[0].split(' ')))
-    root_node = TreeNode()
-    root_node.init_node(tree_data)
+    tree = FlatTree(tree_data)
 
-    node_value = root_node.get_node_value()
+    node_value = tree.get_node_value()
 
     print(node_value)
 